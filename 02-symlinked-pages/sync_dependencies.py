@@ -35,17 +35,45 @@ Cycle detection:
 - If graph A references graph B, and graph B references graph A (directly or transitively), we have a cycle.
 - In that case, this script raises an Exception and aborts.
 
+Symlinks are created with paths relative to the target pages/ folder.
+
 NOTE: This script is intentionally cautious about symlinks:
     - If a symlink with the same name already exists and points to the correct source, we leave it.
     - If a file or symlink with the same name exists but points elsewhere, we remove it and create a new symlink.
+    - A folder with the same name is only replaced if it holds nothing but symlinks;
+      a folder containing regular files is left alone and reported.
 """
 
 import json
 import os
+import shutil
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+# Whether a pages folder can be listed through an open directory descriptor and
+# its symlinks read, created and removed relative to it
+_DIR_FD_SUPPORTED = (
+    hasattr(os, "O_DIRECTORY")
+    and os.scandir in os.supports_fd
+    and all(func in os.supports_dir_fd for func in (os.readlink, os.symlink, os.unlink))
+)
+
+# Parsed `dependent-graphs` lists, keyed by (absolute path, st_mtime_ns) of dependencies.json
+_DEPS_CACHE: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+
+# Graphs are synced on worker threads; this keeps their output lines whole
+_print_lock = threading.Lock()
 
 
-def find_logseq_graphs(root_dir):
+def _print(*args: Any, **kwargs: Any) -> None:
+    """print() serialized across the worker threads."""
+    with _print_lock:
+        print(*args, **kwargs)
+
+
+def find_logseq_graphs(root_dir: str) -> List[str]:
     """
     Return a list of absolute paths to subdirectories of root_dir that
     contain a `logseq/` folder (indicating a Logseq graph).
@@ -60,30 +88,52 @@ def find_logseq_graphs(root_dir):
     return graphs
 
 
-def load_dependencies(graph_folder):
+def load_dependencies(graph_folder: str) -> List[Dict[str, Any]]:
     """
     If `dependencies.json` exists in graph_folder, parse and return the list of
     dependent-graphs. Otherwise, return an empty list.
     """
     dep_file = os.path.join(graph_folder, "dependencies.json")
-    if not os.path.isfile(dep_file):
+    try:
+        return _load_json_cached(dep_file)
+    except FileNotFoundError:
         return []
-    with open(dep_file, "r") as f:
-        data = json.load(f)
-    return data.get("dependent-graphs", [])
 
 
-def build_dependency_graph(graphs):
+def _load_json_cached(path: str) -> List[Dict[str, Any]]:
     """
-    Build an adjacency list representing the dependencies of each graph.
+    Parse the `dependent-graphs` list out of the JSON file at `path`, reusing the
+    previous result as long as the file's modification time hasn't changed.
+    """
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if key not in _DEPS_CACHE:
+        with open(path, "r") as f:
+            data = json.load(f)
+        # A top level that isn't an object has no dependencies to read
+        _DEPS_CACHE[key] = (
+            data.get("dependent-graphs", []) if isinstance(data, dict) else []
+        )
+    return _DEPS_CACHE[key]
+
+
+def build_dependency_graph(
+    graphs: List[str],
+) -> Tuple[Dict[str, List[str]], Dict[str, List[Tuple[str, Dict[str, Any]]]]]:
+    """
+    Build adjacency lists representing the dependencies of each graph.
 
     Returns:
-        adj_list: dict where adj_list[graph_folder] = list of (dep_graph_folder, prefix)
-                  for all dependent graphs discovered.
+        neighbors: dict where neighbors[graph_folder] = list of dep_graph_folder, the
+                   bare structure walked by detect_cycle_dfs.
+        edges: dict where edges[graph_folder] = list of (dep_graph_folder, spec)
+               for all dependent graphs discovered, as used by sync_dependencies.
     """
-    adj_list = {}
+    neighbors: Dict[str, List[str]] = {}
+    edges: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
     for g in graphs:
-        adj_list[g] = []  # Initialize adjacency list
+        # Initialize adjacency lists
+        neighbors[g] = []
+        edges[g] = []
         dep_specs = load_dependencies(g)
         for spec in dep_specs:
             local_graph_path = spec.get("local-graph-path")
@@ -92,96 +142,226 @@ def build_dependency_graph(graphs):
                 continue
             # Convert to absolute path:
             dep_graph_path = os.path.normpath(os.path.join(g, local_graph_path))
-            adj_list[g].append((dep_graph_path, spec))
-    return adj_list
+            neighbors[g].append(dep_graph_path)
+            edges[g].append((dep_graph_path, spec))
+    return neighbors, edges
 
 
-def detect_cycle_dfs(adj_list):
+def detect_cycle_dfs(neighbors: Dict[str, List[str]]) -> None:
     """
-    Detect cycles in the dependency graph using DFS.
+    Detect cycles in the dependency graph (as returned in `neighbors` by
+    build_dependency_graph) using DFS.
 
     Raises:
         Exception if a cycle is found.
     """
-    visited = set()
-    rec_stack = set()  # nodes currently in recursion stack
-
-    def dfs(v):
-        visited.add(v)
-        rec_stack.add(v)
-        if v in adj_list:
-            for neighbor, _ in adj_list[v]:
-                if neighbor not in visited:
-                    dfs(neighbor)
-                elif neighbor in rec_stack:
+    GRAY, BLACK = 0, 1
+    # GRAY while a node is on the DFS stack, BLACK once fully explored
+    color: Dict[str, int] = {}
+
+    for node in neighbors:
+        if node in color:
+            continue
+        color[node] = GRAY
+        # Explicit stack of (node, iterator over its neighbors) instead of recursion
+        stack = [(node, iter(neighbors.get(node, ())))]
+        while stack:
+            v, remaining = stack[-1]
+            for neighbor in remaining:
+                state = color.get(neighbor)
+                if state is None:
+                    color[neighbor] = GRAY
+                    stack.append((neighbor, iter(neighbors.get(neighbor, ()))))
+                    break
+                if state == GRAY:
                     # Found a cycle
                     raise Exception(
                         f"Cycle detected: {neighbor} is referenced cyclically."
                     )
-        rec_stack.remove(v)
-
-    for node in adj_list:
-        if node not in visited:
-            dfs(node)
+            else:
+                # All edges explored
+                color[v] = BLACK
+                stack.pop()
 
 
-def ensure_dir_exists(path):
+def ensure_dir_exists(path: str) -> None:
     """Create the directory if it doesn't exist."""
     os.makedirs(path, exist_ok=True)
 
 
-def link_files_with_prefix(source_dir, target_dir, prefix):
+def link_files_with_prefix(source_dir: str, target_dir: str, prefix: str) -> None:
     """
     For each file in source_dir that starts with `prefix`, create/update symlink in target_dir.
     """
-    if not os.path.isdir(source_dir):
+    try:
+        # List the source up front so no directory handle is held open (and leaked
+        # on error) while the target is being prepared
+        with os.scandir(source_dir) as it:
+            candidates = [entry.name for entry in it if entry.name.startswith(prefix)]
+    except (FileNotFoundError, NotADirectoryError):
         return  # Nothing to do if no source/pages folder
     ensure_dir_exists(target_dir)
 
-    for fname in os.listdir(source_dir):
-        if fname.startswith(prefix):
-            source_path = os.path.join(source_dir, fname)
-            target_path = os.path.join(target_dir, fname)
-            # If target_path already exists, check if it is the correct symlink
-            if os.path.islink(target_path):
-                current_link = os.readlink(target_path)
-                if os.path.abspath(current_link) == os.path.abspath(source_path):
+    # Both prefixes are normalized once, so per-file paths are plain concatenations.
+    # Links are relative to target_dir, so the graphs can be moved around together.
+    # They are computed between the real (symlink-free) folders, because the kernel
+    # resolves ".." in a link against where the target folder really is on disk.
+    real_source_dir = os.path.realpath(source_dir)
+    real_target_dir = os.path.realpath(target_dir)
+    real_source_prefix = os.path.join(real_source_dir, "")
+    try:
+        link_prefix = os.path.join(
+            os.path.relpath(real_source_dir, real_target_dir), ""
+        )
+    except ValueError:
+        # No relative path exists (e.g. different drives on Windows)
+        link_prefix = real_source_prefix
+    real_link_dirs: Dict[str, str] = {}  # folder a link points into -> its realpath
+    target_prefix = os.path.join(target_dir, "")
+
+    # Where the platform allows, target_dir is opened once and everything below
+    # (listing it, reading, removing and creating links) goes through that
+    # descriptor instead of re-resolving the full target path on every call.
+    if _DIR_FD_SUPPORTED:
+        target_fd: Optional[int] = os.open(target_dir, os.O_RDONLY | os.O_DIRECTORY)
+        name_prefix = ""
+    else:
+        target_fd = None
+        name_prefix = target_prefix
+    try:
+        # Scan the target once into a name -> DirEntry map; d_type from the listing
+        # answers is_symlink/is_dir, so existing targets cost no stat calls
+        if target_fd is not None:
+            target_it = os.scandir(target_fd)
+        else:
+            target_it = os.scandir(target_dir)
+        with target_it:
+            existing = {entry.name: entry for entry in target_it}
+
+        # First pass: decide what has to change without touching the target directory
+        # (fname, is_dir) of stale links, files and folders
+        to_remove: List[Tuple[str, bool]] = []
+        to_link: List[str] = []  # fnames of symlinks to create
+        for fname in candidates:
+            target_entry = existing.get(fname)
+            # If the target already exists, check if it is the correct symlink
+            if target_entry is not None and target_entry.is_symlink():
+                current_link = os.readlink(name_prefix + fname, dir_fd=target_fd)
+                # Resolve the folder the link points into the way the kernel does
+                # (relative links from the real target folder; absolute ones made by
+                # older versions of this script as-is), but not the file itself,
+                # which may legitimately be a symlink in the source graph
+                link_dir, link_name = os.path.split(
+                    os.path.join(real_target_dir, current_link)
+                )
+                real_link_dir = real_link_dirs.get(link_dir)
+                if real_link_dir is None:
+                    real_link_dir = real_link_dirs[link_dir] = os.path.realpath(
+                        link_dir
+                    )
+                if os.path.join(real_link_dir, link_name) == real_source_prefix + fname:
                     # Already the correct symlink; do nothing
                     continue
-                else:
-                    # Remove incorrect link
-                    os.remove(target_path)
-            elif os.path.exists(target_path):
+                # Remove incorrect link
+                to_remove.append((fname, False))
+            elif target_entry is not None:
                 # It's a real file or folder, not a link; remove it
-                if os.path.isdir(target_path):
-                    # If it's a folder, either skip or remove. Let's remove to keep it consistent.
-                    # But be cautious with destructive actions in your environment.
-                    # For a safer approach, you could rename or skip. Here we remove for clarity.
-                    import shutil
-
-                    shutil.rmtree(target_path)
-                else:
-                    os.remove(target_path)
-            # Create the symlink
-            os.symlink(os.path.abspath(source_path), target_path)
+                is_dir = target_entry.is_dir(follow_symlinks=False)
+                if is_dir and not _holds_only_links(target_prefix + fname):
+                    # Never delete a folder with real content in it; leave it alone
+                    _print(
+                        f"Not replacing folder {target_prefix + fname} with a "
+                        "symlink: it contains regular files."
+                    )
+                    continue
+                to_remove.append((fname, is_dir))
+            to_link.append(fname)
+
+        # Second pass: apply the removals, then create all the new symlinks
+        for fname, is_dir in to_remove:
+            if is_dir:
+                # Only folders of links reach this point (see _holds_only_links)
+                shutil.rmtree(target_prefix + fname)
+            else:
+                os.unlink(name_prefix + fname, dir_fd=target_fd)
+        for fname in to_link:
+            os.symlink(link_prefix + fname, name_prefix + fname, dir_fd=target_fd)
+    finally:
+        if target_fd is not None:
+            os.close(target_fd)
+
+
+def _holds_only_links(path: str) -> bool:
+    """
+    Return True if the folder at `path` contains nothing but symlinks and
+    folders of symlinks, i.e. nothing that would be lost by removing it.
+    """
+    for dirpath, _dirnames, filenames in os.walk(path):
+        for name in filenames:
+            if not os.path.islink(os.path.join(dirpath, name)):
+                return False
+    return True
 
 
-def sync_dependencies(adj_list):
+def sync_dependencies(adj_list: Dict[str, List[Tuple[str, Dict[str, Any]]]]) -> None:
     """
     For each graph, read its dependencies again (or reuse) and perform symlinking
     of matching files from the dependent graph's pages folder.
-    """
-    for graph_folder, deps in adj_list.items():
-        # graph_folder is the 'target' graph
-        pages_folder = os.path.join(graph_folder, "pages")
-        for dep_graph_path, spec in deps:
-            only_prefix = spec.get("only-files-beginning-with", "")
-            # The "source" is the dependent graph's pages folder
-            source_pages = os.path.join(dep_graph_path, "pages")
-            link_files_with_prefix(source_pages, pages_folder, only_prefix)
-
 
-def main():
+    The work is almost all blocking filesystem calls, so graphs are processed on a
+    thread pool. A graph lists the pages folders of the graphs it depends on, which
+    must not be relinked at the same time, so graphs run level by level, each level
+    after all the graphs it reads from.
+    """
+    levels = _dependency_levels(
+        {graph: [dep for dep, _ in deps] for graph, deps in adj_list.items()}
+    )
+    if not levels:
+        return
+    max_workers = min(32, max(len(level) for level in levels))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for level in levels:
+            # Consume the results so that any exception from a worker is re-raised here
+            list(executor.map(_sync_graph, level, [adj_list[g] for g in level]))
+
+
+def _dependency_levels(sources: Dict[str, List[str]]) -> List[List[str]]:
+    """
+    Group graphs into levels such that every graph comes after all graphs it reads
+    pages from. Graphs in one level never read each other's pages, so a level can be
+    synced concurrently once the previous levels are done. Graphs that are part of
+    (or depend on) a dependency cycle are appended one per level, in input order.
+    """
+    remaining = {
+        graph: {dep for dep in deps if dep in sources and dep != graph}
+        for graph, deps in sources.items()
+    }
+    levels: List[List[str]] = []
+    while remaining:
+        ready = [graph for graph, deps in remaining.items() if not deps]
+        if not ready:
+            levels.extend([graph] for graph in remaining)
+            break
+        levels.append(ready)
+        for graph in ready:
+            del remaining[graph]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return levels
+
+
+def _sync_graph(graph_folder: str, deps: List[Tuple[str, Dict[str, Any]]]) -> None:
+    """Symlink the matching files of every dependency of a single graph."""
+    # graph_folder is the 'target' graph
+    pages_folder = os.path.join(graph_folder, "pages")
+    for dep_graph_path, spec in deps:
+        only_prefix = spec.get("only-files-beginning-with", "")
+        # The "source" is the dependent graph's pages folder
+        source_pages = os.path.join(dep_graph_path, "pages")
+        link_files_with_prefix(source_pages, pages_folder, only_prefix)
+
+
+def main() -> None:
     root_dir = os.path.abspath(os.path.dirname(__file__))
     # 1. Find all subdirectories that are Logseq graphs
     graphs = find_logseq_graphs(root_dir)
@@ -189,18 +369,18 @@ def main():
         print("No Logseq graphs found.")
         sys.exit(0)
 
-    # 2. Build adjacency list from dependencies.json
-    adj_list = build_dependency_graph(graphs)
+    # 2. Build adjacency lists from dependencies.json
+    neighbors, edges = build_dependency_graph(graphs)
 
     # 3. Detect cycles
     try:
-        detect_cycle_dfs(adj_list)
+        detect_cycle_dfs(neighbors)
     except Exception as e:
         print("Dependency cycle detected:", e)
         sys.exit(1)
 
     # 4. Perform symlinking for all dependencies
-    sync_dependencies(adj_list)
+    sync_dependencies(edges)
     print("Sync complete.")
 
 
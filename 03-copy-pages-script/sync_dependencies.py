@@ -32,8 +32,10 @@ A typical `dependencies.json` file might look like:
   - "source-namespace-name": The namespace prefix in the source graph (e.g. "Python").
   - "target-namespace-name": The namespace prefix to use in the target (e.g. "Python").
   - "overwrite-if-source-is-newer": A boolean indicating whether an existing file in the
-    target should be overwritten only if the source file's modification time is strictly
-    newer.
+    target should be overwritten only if the source file's modification time is newer
+    (see OVERWRITING LOGIC below).
+  - "compare-content-before-overwrite": Optional boolean (default false). When true, a
+    newer source is only copied if its content actually differs from the target.
 
 -------------------------------------------------------------------------------
 WHAT GETS COPIED:
@@ -54,13 +56,19 @@ OVERWRITING LOGIC:
 By default, if the target file already exists:
   - If "overwrite-if-source-is-newer" = false, we skip copying entirely.
   - If "overwrite-if-source-is-newer" = true, we compare file modification times
-    and only overwrite if the source is strictly newer. Otherwise, we skip.
+    and only overwrite if the source is newer by more than 1 ms (to absorb
+    filesystem timestamp resolution). Otherwise, we skip.
+  - If "compare-content-before-overwrite" = true as well, a source that is newer by
+    mtime is still skipped when the target already contains exactly the page-level
+    attributes plus the source contents (e.g. after a `touch` or a fresh clone). The
+    target's mtime is then set to the source's so later runs skip it cheaply.
+    Contents are hashed with xxhash if it is installed, hashlib's blake2b otherwise.
 
 -------------------------------------------------------------------------------
 PAGE-LEVEL ATTRIBUTES:
 -------------------------------------------------------------------------------
-If a file is copied or overwritten, the script opens the newly created target `.md`
-file and prepends two attributes at the top:
+If a file is copied or overwritten, the script writes two attributes at the top of
+the target `.md` file, ahead of the copied source contents:
 
   logseq-remote-page:: true
   logseq-remote-page-link:: logseq://graph/<SOURCE_GRAPH_NAME>?page=<ENCODED_PAGE_NAME>
@@ -90,6 +98,9 @@ any `.md` files under `python/pages/` that start with "Python" will be copied in
 `work/pages/`, potentially overwritten if newer, and will include the logseq-remote
 page-level attributes inserted at the top of each file.
 
+Per-file copy/skip decisions are logged at DEBUG level; run with `LOGLEVEL=DEBUG`
+to see them.
+
 -------------------------------------------------------------------------------
 DIRECTORY STRUCTURE (ILLUSTRATION):
 -------------------------------------------------------------------------------
@@ -120,89 +131,232 @@ logic and overwriting rules set forth in `work/dependencies.json`.
 -------------------------------------------------------------------------------
 """
 
+import hashlib
 import json
+import logging
 import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from urllib.parse import quote
 
+try:
+    import xxhash  # type: ignore[import-not-found]
+except ImportError:  # optional; fall back to hashlib
+    xxhash = None
+
+log = logging.getLogger(__name__)
+
+# A source must be newer than its copy by more than this to be considered "newer",
+# absorbing timestamp-resolution differences between filesystems.
+MTIME_TOLERANCE_NS = 1_000_000  # 1 ms
+
+# Parsed `dependent-graphs` lists, keyed by (abspath, st_mtime_ns) of dependencies.json.
+# None records a file that parsed but had no `dependent-graphs` key.
+_DEPS_CACHE: Dict[Tuple[str, int], Optional[List[Dict[str, Any]]]] = {}
+
+# Content digests of target pages, keyed by (path, st_mtime_ns)
+_TARGET_DIGESTS: Dict[Tuple[str, int], bytes] = {}
+
+# Graphs are synced on worker threads; this keeps their progress lines whole
+_print_lock = threading.Lock()
+
+
+def _print(*args: Any, **kwargs: Any) -> None:
+    """print() serialized across the worker threads."""
+    with _print_lock:
+        print(*args, **kwargs)
+
+
+# Log records raised while a worker thread syncs a graph, held until that graph is
+# done so its messages come out together under its header
+_graph_log = threading.local()
+
+
+class _GraphLogHandler(logging.Handler):
+    """
+    Pass records on to `handler`, except on a thread that is syncing a graph: those
+    are held in the thread's buffer for `_process_graph` to emit afterwards.
+    """
+
+    def __init__(self, handler: logging.Handler) -> None:
+        super().__init__()
+        self.handler = handler
+
+    def emit(self, record: logging.LogRecord) -> None:
+        held: Optional[List[logging.LogRecord]] = getattr(_graph_log, "records", None)
+        if held is None:
+            self.handler.handle(record)
+        else:
+            held.append(record)
+
 
 def copy_file_if_needed(
-    source_file_path: str, target_file_path: str, overwrite_if_newer: bool
+    source_file_path: str,
+    target_file_path: str,
+    overwrite_if_newer: bool,
+    source_entry: Optional["os.DirEntry[str]"] = None,
+    make_header: Optional[Callable[[], str]] = None,
+    content_check: bool = False,
 ) -> bool:
     """
     Copy source_file_path to target_file_path if necessary, respecting 'overwrite_if_newer'.
+    The string returned by `make_header` is written ahead of the copied contents; it
+    is only called once a copy (or content check) is actually going to happen.
     Returns True if a copy actually occurred (either new file or overwriting).
     Returns False if skipping.
+
+    If `source_entry` is given (a DirEntry from os.scandir for the source file), its
+    cached stat result is used instead of stat'ing source_file_path again.
+
+    If `content_check` is true, a source that is newer by mtime is still skipped when
+    the target already holds the header + the source contents byte-for-byte. The
+    target's mtime is then bumped to the source's so later runs skip it on mtime.
     """
-    if not os.path.exists(source_file_path):
-        print(f"Source file does not exist: {source_file_path}")
-        return False
+    # With a DirEntry, the source is only stat'ed if mtimes get compared; a missing
+    # source then shows up there or when the copy opens it.
+    source_stat: Optional[os.stat_result] = None
+    if source_entry is None:
+        try:
+            source_stat = os.stat(source_file_path)
+        except FileNotFoundError:
+            log.warning("Source file does not exist: %s", source_file_path)
+            return False
+
+    try:
+        target_stat = os.stat(target_file_path)
+    except FileNotFoundError:
+        target_stat = None
 
     # If the target does NOT exist, always copy
-    if not os.path.exists(target_file_path):
-        print(f"Copying new file:\n  {source_file_path}\n-> {target_file_path}")
-        _do_copy(source_file_path, target_file_path)
-        return True
+    if target_stat is None:
+        log.debug("Copying new file:\n  %s\n-> %s", source_file_path, target_file_path)
+        header = make_header() if make_header is not None else ""
+        return _copy_from_source(source_file_path, target_file_path, header)
 
     # If the target exists and we don't allow overwrites, do nothing
     if not overwrite_if_newer:
-        print(f"Skipping file (overwrite_if_newer=False): {target_file_path}")
+        log.debug("Skipping file (overwrite_if_newer=False): %s", target_file_path)
         return False
 
     # If the target exists and we do allow overwrites, compare mtimes
-    source_mtime = os.path.getmtime(source_file_path)
-    target_mtime = os.path.getmtime(target_file_path)
-    if source_mtime > target_mtime:
-        print(f"Overwriting older file:\n  {source_file_path}\n-> {target_file_path}")
-        _do_copy(source_file_path, target_file_path)
-        return True
+    if source_stat is None:
+        assert source_entry is not None  # only left unset when a DirEntry was given
+        try:
+            source_stat = source_entry.stat()
+        except FileNotFoundError:
+            log.warning("Source file does not exist: %s", source_file_path)
+            return False
+    if source_stat.st_mtime_ns > target_stat.st_mtime_ns + MTIME_TOLERANCE_NS:
+        header = make_header() if make_header is not None else ""
+        if content_check and _content_unchanged(
+            source_file_path, source_stat, target_file_path, target_stat, header
+        ):
+            log.debug("Content unchanged, skipping: %s", target_file_path)
+            os.utime(
+                target_file_path,
+                ns=(target_stat.st_atime_ns, source_stat.st_mtime_ns),
+            )
+            _TARGET_DIGESTS[(target_file_path, source_stat.st_mtime_ns)] = (
+                _TARGET_DIGESTS.pop((target_file_path, target_stat.st_mtime_ns))
+            )
+            return False
+        log.debug(
+            "Overwriting older file:\n  %s\n-> %s", source_file_path, target_file_path
+        )
+        return _copy_from_source(source_file_path, target_file_path, header)
     else:
-        print(f"Target is up to date, skipping: {target_file_path}")
+        log.debug("Target is up to date, skipping: %s", target_file_path)
+        return False
+
+
+def _content_unchanged(
+    source_file_path: str,
+    source_stat: os.stat_result,
+    target_file_path: str,
+    target_stat: os.stat_result,
+    header: str,
+) -> bool:
+    """
+    Return True if the target's bytes equal `header` followed by the source's bytes.
+    Sizes are compared first so that most changed pages are never read.
+    """
+    header_bytes = header.encode("utf-8")
+    if target_stat.st_size != len(header_bytes) + source_stat.st_size:
+        return False
+
+    key = (target_file_path, target_stat.st_mtime_ns)
+    target_digest = _TARGET_DIGESTS.get(key)
+    if target_digest is None:
+        target_digest = _content_digest(target_file_path)
+        _TARGET_DIGESTS[key] = target_digest
+    return _content_digest(source_file_path, header_bytes) == target_digest
+
+
+def _content_digest(path: str, prefix: bytes = b"") -> bytes:
+    """Hash `prefix` followed by the file's contents, streamed in 1 MiB chunks."""
+    hasher = xxhash.xxh3_64() if xxhash is not None else hashlib.blake2b()
+    hasher.update(prefix)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.digest()
+
+
+def _copy_from_source(
+    source_file_path: str, target_file_path: str, header: str
+) -> bool:
+    """
+    Copy as `_copy_with_prepended_header` does, but warn and return False instead of
+    raising when the source file is gone (e.g. a dangling symlink in `pages/`).
+    """
+    try:
+        _copy_with_prepended_header(source_file_path, target_file_path, header)
+    except FileNotFoundError as e:
+        if e.filename != source_file_path:
+            raise
+        log.warning("Source file does not exist: %s", source_file_path)
         return False
+    return True
 
 
-def _do_copy(src_path: str, dst_path: str) -> None:
-    """Helper function that actually does the file copy, creating directories as needed."""
-    dst_dir = os.path.dirname(dst_path)
-    if not os.path.exists(dst_dir):
-        os.makedirs(dst_dir, exist_ok=True)
+def _copy_with_prepended_header(src_path: str, dst_path: str, header: str) -> None:
+    """
+    Write `header` followed by the verbatim contents of src_path to dst_path in a
+    single pass, creating directories as needed.
+    """
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
 
     with open(src_path, "rb") as src_f, open(dst_path, "wb") as dst_f:
-        dst_f.write(src_f.read())
+        dst_f.write(header.encode("utf-8"))
+        shutil.copyfileobj(src_f, dst_f, length=1024 * 1024)
 
 
-def _prepend_page_level_attributes(
-    target_file_path: str, source_graph_name: str
-) -> None:
+def _page_level_attributes(page_file_name: str, page_link_prefix: str) -> str:
     """
-    Open the newly copied file at `target_file_path`, determine the "page name"
-    from the filename, and prepend two lines:
+    Given a page's file name and its source graph's link prefix
+    (`logseq://graph/<SOURCE_GRAPH_NAME>?page=`), return the two lines (plus a
+    blank separator line) to put at the top of the page:
 
       logseq-remote-page:: true
       logseq-remote-page-link:: logseq://graph/<SOURCE_GRAPH_NAME>?page=<URL_ENCODED_PAGE_NAME>
     """
-    # Figure out the base name without .md
-    base_name = os.path.splitext(os.path.basename(target_file_path))[0]
-    page_name = _derive_page_name(base_name)
+    # Page name is the filename without .md
+    if page_file_name.endswith(".md"):
+        base_name = page_file_name[:-3]
+    else:
+        base_name = os.path.splitext(page_file_name)[0]
 
     # URL-encode all special characters (including slash)
-    encoded_page_name = quote(page_name, safe="")
-    logseq_url = f"logseq://graph/{source_graph_name}?page={encoded_page_name}"
+    encoded_page_name = quote(_derive_page_name(base_name), safe="")
 
-    # Read the existing contents
-    with open(target_file_path, "r", encoding="utf-8") as f:
-        old_content = f.read()
-
-    # Prepend the page-level attributes
-    new_content = (
+    return (
         f"logseq-remote-page:: true\n"
-        f"logseq-remote-page-link:: {logseq_url}\n\n"
-        f"{old_content}"
+        f"logseq-remote-page-link:: {page_link_prefix}{encoded_page_name}\n\n"
     )
 
-    # Write back
-    with open(target_file_path, "w", encoding="utf-8") as f:
-        f.write(new_content)
-
 
 def _derive_page_name(base_name: str) -> str:
     """
@@ -219,92 +373,232 @@ def _derive_page_name(base_name: str) -> str:
     return base_name.replace("___", "/")
 
 
+def _load_json_cached(path: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Return the `dependent-graphs` list from the JSON file at `path` (or None if the
+    key or the top-level object is missing), reusing the previous parse while the file's mtime is unchanged.
+    """
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if key not in _DEPS_CACHE:
+        with open(path, "r", encoding="utf-8") as f:
+            deps_data = json.load(f)
+        # A top level that isn't an object is treated like a missing key
+        _DEPS_CACHE[key] = (
+            deps_data.get("dependent-graphs") if isinstance(deps_data, dict) else None
+        )
+    return _DEPS_CACHE[key]
+
+
 def sync_graph_dependencies(target_graph_dir: str) -> None:
     """
     Given a path to a target graph directory (which presumably has a dependencies.json),
-    read that file and carry out the specified file sync logic. Then, for each newly
-    copied/overwritten file, prepend the page-level attributes.
+    read that file and carry out the specified file sync logic. Each newly
+    copied/overwritten file gets the page-level attributes at its top.
     """
     dependencies_path = os.path.join(target_graph_dir, "dependencies.json")
-    if not os.path.isfile(dependencies_path):
-        return  # No dependencies.json here; do nothing
-
     try:
-        with open(dependencies_path, "r", encoding="utf-8") as f:
-            deps_data = json.load(f)
+        dependent_graphs = _load_json_cached(dependencies_path)
+    except FileNotFoundError:
+        return  # No dependencies.json here; do nothing
     except (json.JSONDecodeError, OSError) as e:
-        print(f"Error reading/parsing {dependencies_path}: {e}")
+        log.warning("Error reading/parsing %s: %s", dependencies_path, e)
         return
 
-    if "dependent-graphs" not in deps_data:
-        print(f"No 'dependent-graphs' key found in {dependencies_path}; skipping.")
+    if dependent_graphs is None:
+        log.warning(
+            "No 'dependent-graphs' key found in %s; skipping.", dependencies_path
+        )
         return
 
+    # Target page paths are built by concatenation in the per-file loop below
+    target_pages_prefix = os.path.join(target_graph_dir, "pages", "")
+
+    # Directory listings of source pages folders, reused for the rest of this call
+    listings: Dict[str, List["os.DirEntry[str]"]] = {}
+
     # For each dependent-graph config in the JSON, sync the namespaces
-    for dependent_graph in deps_data["dependent-graphs"]:
+    for dependent_graph in dependent_graphs:
         local_graph_path = dependent_graph.get("local-graph-path")
         namespaces_to_sync = dependent_graph.get("namespaces-to-sync", [])
 
         if not local_graph_path:
-            print("No local-graph-path provided; skipping this entry.")
+            log.warning(
+                "No local-graph-path provided in %s; skipping this entry.",
+                dependencies_path,
+            )
             continue
 
         source_graph_dir = os.path.abspath(
             os.path.join(target_graph_dir, local_graph_path)
         )
-        # This is used in the final logseq:// URL
-        source_graph_name = os.path.basename(os.path.normpath(source_graph_dir))
+        # This is used in the final logseq:// URL; abspath has already normalized it
+        source_graph_name = os.path.basename(source_graph_dir)
+        page_link_prefix = f"logseq://graph/{source_graph_name}?page="
 
-        target_graph_pages_dir = os.path.join(target_graph_dir, "pages")
         source_graph_pages_dir = os.path.join(source_graph_dir, "pages")
 
-        if not os.path.isdir(source_graph_pages_dir):
-            print(f"No pages directory in source graph: {source_graph_pages_dir}")
-            continue
-
+        # Resolve every namespace config up front so the source pages are scanned once
+        # per dependent graph rather than once per namespace.
+        exact_matches: Dict[str, List[Tuple[str, str, bool, bool]]] = {}
+        subpage_matches: List[Tuple[str, Tuple[str, str, bool, bool]]] = []
         for namespace_config in namespaces_to_sync:
             source_namespace = namespace_config["source-namespace-name"]
             target_namespace = namespace_config["target-namespace-name"]
             overwrite_if_source_is_newer = namespace_config.get(
                 "overwrite-if-source-is-newer", False
             )
+            compare_content = namespace_config.get(
+                "compare-content-before-overwrite", False
+            )
+            namespace = (
+                source_namespace,
+                target_namespace,
+                overwrite_if_source_is_newer,
+                compare_content,
+            )
+            exact_matches.setdefault(source_namespace + ".md", []).append(namespace)
+            subpage_matches.append((source_namespace + "___", namespace))
+        # Cheap C-level prefilter; the exact/subpage checks below pick the configs
+        prefixes = tuple(exact_matches) + tuple(p for p, _ in subpage_matches)
+
+        # Copy each relevant .md file. Listings are shared between dependent-graph
+        # entries that point at the same source graph.
+        entries = listings.get(source_graph_pages_dir)
+        if entries is None:
+            try:
+                with os.scandir(source_graph_pages_dir) as it:
+                    entries = list(it)
+            except (FileNotFoundError, NotADirectoryError):
+                log.warning(
+                    "No pages directory in source graph: %s", source_graph_pages_dir
+                )
+                continue
+            listings[source_graph_pages_dir] = entries
+        for entry in entries:
+            fname = entry.name
+            if not fname.startswith(prefixes):
+                continue
+            matching_namespaces = exact_matches.get(fname, []) + [
+                namespace
+                for sub_prefix, namespace in subpage_matches
+                if fname.startswith(sub_prefix)
+            ]
 
-            # Copy each relevant .md file
-            for fname in os.listdir(source_graph_pages_dir):
-                is_exact = fname == f"{source_namespace}.md"
-                is_subpage = fname.startswith(f"{source_namespace}___")
-                if not (is_exact or is_subpage):
-                    continue
-
-                source_file_path = os.path.join(source_graph_pages_dir, fname)
+            for (
+                source_namespace,
+                target_namespace,
+                overwrite_if_source_is_newer,
+                compare_content,
+            ) in matching_namespaces:
                 # Replace the FIRST occurrence of source_namespace with target_namespace in the filename
                 new_fname = fname.replace(source_namespace, target_namespace, 1)
-                target_file_path = os.path.join(target_graph_pages_dir, new_fname)
-
-                # Perform the copy if needed
-                did_copy = copy_file_if_needed(
-                    source_file_path, target_file_path, overwrite_if_source_is_newer
+                target_file_path = target_pages_prefix + new_fname
+
+                # Perform the copy if needed, writing the page-level attributes
+                # ahead of the source contents (only built if a copy happens)
+                copy_file_if_needed(
+                    entry.path,
+                    target_file_path,
+                    overwrite_if_source_is_newer,
+                    source_entry=entry,
+                    make_header=partial(
+                        _page_level_attributes, new_fname, page_link_prefix
+                    ),
+                    content_check=compare_content,
                 )
 
-                # If we actually copied/overwrote the file, then prepend the page-level attributes
-                if did_copy:
-                    _prepend_page_level_attributes(target_file_path, source_graph_name)
+
+def _source_graph_dirs(graph_dir: str) -> List[str]:
+    """Absolute paths of the graphs whose pages `graph_dir` syncs from."""
+    try:
+        dependent_graphs = _load_json_cached(
+            os.path.join(graph_dir, "dependencies.json")
+        )
+    except (json.JSONDecodeError, OSError):
+        return []  # Reported when the graph itself is synced
+    return [
+        os.path.abspath(os.path.join(graph_dir, dependent_graph["local-graph-path"]))
+        for dependent_graph in dependent_graphs or []
+        if dependent_graph.get("local-graph-path")
+    ]
+
+
+def _dependency_levels(sources: Dict[str, List[str]]) -> List[List[str]]:
+    """
+    Group graphs into levels such that every graph comes after all graphs it reads
+    pages from. Graphs in one level never read each other's pages, so a level can be
+    synced concurrently once the previous levels are done. Graphs that are part of
+    (or depend on) a dependency cycle are appended one per level, in input order.
+    """
+    remaining = {
+        graph: {dep for dep in deps if dep in sources and dep != graph}
+        for graph, deps in sources.items()
+    }
+    levels: List[List[str]] = []
+    while remaining:
+        ready = [graph for graph, deps in remaining.items() if not deps]
+        if not ready:
+            levels.extend([graph] for graph in remaining)
+            break
+        levels.append(ready)
+        for graph in ready:
+            del remaining[graph]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return levels
+
+
+def _process_graph(graph_dir: str) -> None:
+    """
+    Sync a single target graph. Its log messages are held back and emitted after its
+    header once it is done, so graphs synced side by side don't interleave.
+    """
+    held: List[logging.LogRecord] = []
+    _graph_log.records = held
+    try:
+        sync_graph_dependencies(graph_dir)
+    finally:
+        _graph_log.records = None
+        with _print_lock:
+            print(f"\n=== Processing dependencies in: {graph_dir} ===", flush=True)
+            for record in held:
+                log.handle(record)
 
 
-def main():
+def main() -> None:
     """
     Main entry point. Iterate over all subdirectories in the current directory.
     If a subdir has a dependencies.json, run sync_graph_dependencies on it.
     """
+    stderr_handler = logging.StreamHandler()
+    stderr_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(
+        level=os.environ.get("LOGLEVEL", "WARNING").upper(),
+        handlers=[_GraphLogHandler(stderr_handler)],
+    )
+
     current_dir = os.getcwd()
+    graph_dirs = []
     for entry in os.listdir(current_dir):
         full_path = os.path.join(current_dir, entry)
         if os.path.isdir(full_path):
             dependencies_file = os.path.join(full_path, "dependencies.json")
             if os.path.isfile(dependencies_file):
-                print(f"\n=== Processing dependencies in: {full_path} ===")
-                sync_graph_dependencies(full_path)
-    print("\nDone.")
+                graph_dirs.append(full_path)
+
+    # Syncing is dominated by blocking file I/O (which releases the GIL), so graphs
+    # are processed concurrently. A graph can read another graph's pages while that
+    # one rewrites them, though, so graphs only run alongside graphs they don't
+    # depend on: level by level, each level after all the graphs it reads from.
+    levels = _dependency_levels(
+        {graph_dir: _source_graph_dirs(graph_dir) for graph_dir in graph_dirs}
+    )
+    if levels:
+        max_workers = min(32, max(len(level) for level in levels))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for level in levels:
+                list(executor.map(_process_graph, level))
+    _print("\nDone.")
 
 
 if __name__ == "__main__":